@@ -1,14 +1,23 @@
+import asyncio
+import atexit
+import functools
+import hashlib
+import itertools
+import json
 import os
 import re
-import datetime
 import sqlite3
-from contextlib import contextmanager
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
 from unittest.mock import Mock, patch
 
+import orjson
 import pytest
 import requests
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, OpenAIError
 from gigachat import GigaChat
 
 # Load environment variables
@@ -19,6 +28,13 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_API_URL = os.getenv("OPENAI_API_URL")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
+# Route the non-interactive fan-out requests through the OpenAI Batch API
+USE_BATCH_API = os.getenv("USE_BATCH_API", "0") == "1"
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "10"))
+# Seconds to wait for a batch before cancelling it
+BATCH_MAX_WAIT = float(os.getenv("BATCH_MAX_WAIT", "1800"))
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
 OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
 
@@ -29,16 +45,115 @@ GIGACHAT_MODEL = os.getenv("MYGIGACHAT_MODEL")
 # Database configuration
 DATABASE_PATH = "saphire.db"
 
+# Shared INSERT for dialogue entries, kept in one place
+INSERT_DIALOGUE_SQL = """
+    INSERT INTO model_dialogues
+    (test_name, model_name, message_type, message_content, aspect, sequence_number)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Response cache configuration. The tests exist to exercise live models, and a
+# cached run replays earlier answers without contacting any provider, so the
+# cache is off unless RESPONSE_CACHE_ENABLED=1 is set (e.g. while developing
+# the tests themselves). Cached rows are stored in DATABASE_PATH.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "0") == "1"
+# Embedding models truncate long inputs (all-MiniLM-L6-v2 keeps 256 tokens), so
+# prompts sharing a long prefix look identical; semantic lookups are opt-in and
+# need the optional sentence-transformers package, imported only when enabled.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SIMILARITY_THRESHOLD = 0.92
+SIMILARITY_SCAN_LIMIT = 500
+
+# Start of the text get_model_response returns instead of raising
+ERROR_RESPONSE_PREFIX = "Error getting response from"
+
+MODEL_NAMES = {
+    "openai": OPENAI_MODEL,
+    "ollama": OLLAMA_MODEL,
+    "gigachat": GIGACHAT_MODEL,
+}
+
+# Any character from the Cyrillic block marks a response as Russian
+_RU_RE = re.compile(r"[\u0400-\u04FF]")
+# A word character that is neither a digit nor an underscore, i.e. a letter
+_ALPHA_RE = re.compile(r"[^\W\d_]")
+
+# Number of most recent dialogue turns sent along with the topic
+CONTEXT_WINDOW_TURNS = int(os.getenv("CONTEXT_WINDOW_TURNS", "4"))
+
+# Prompt templates shared by every turn of the tests
+DIALOGUE_REQUIREMENTS = """
+You are taking part in a dialogue between several language models.
+Every reply must meet the following requirements:
+1. The response must be in Russian
+2. The response must be related to previous messages
+3. Provide a constructive suggestion or idea
+4. Response length - no more than 2-3 sentences
+"""
+
+CONTINUE_PROMPT = "Please continue the dialogue."
+
+ASPECT_REQUIREMENTS = """
+Requirements for the response:
+1. The response must be in Russian
+2. Provide a specific solution
+3. Explain how it will help in children's education
+4. Response length - 2-3 sentences
+"""
+
+FINAL_REQUIREMENTS = """
+Requirements for the response:
+1. The response must be in Russian
+2. Propose a concrete plan for combining the solutions
+3. Indicate the advantages of such a combination
+4. Response length - 3-4 sentences
+"""
+
+
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA temp_store=memory",
+    "PRAGMA foreign_keys=true",
+)
+
+# A single connection is shared by the whole process; the lock keeps
+# operations from different threads from interleaving inside a transaction
+_CONN = None
+_CONN_LOCK = threading.RLock()
+
+
+def _init_pragmas(conn):
+    """Apply the journal and performance settings to the connection."""
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+
+def _get_shared_connection():
+    """Open the process-wide database connection on first use."""
+    global _CONN
+    if _CONN is None:
+        _CONN = sqlite3.connect(DATABASE_PATH, check_same_thread=False, isolation_level=None)
+        _CONN.row_factory = sqlite3.Row
+        _init_pragmas(_CONN)
+        atexit.register(_CONN.close)
+    return _CONN
+
 
 @contextmanager
 def get_db_connection():
     """Context manager for database operations."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+    with _CONN_LOCK:
+        conn = _get_shared_connection()
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
 
 
 def init_db():
@@ -58,9 +173,143 @@ def init_db():
             )
             """
         )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_md_test
+            ON model_dialogues (test_name, sequence_number)
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_md_test_ts
+            ON model_dialogues (test_name, timestamp)
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS model_response_cache (
+                prompt_hash TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                embedding BLOB,
+                response TEXT NOT NULL,
+                ts DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_response_cache_model_ts
+            ON model_response_cache (model, ts)
+            """
+        )
         conn.commit()
 
 
+@functools.lru_cache(maxsize=None)
+def get_embedding_model():
+    """Load the sentence embedding model used for semantic cache lookups."""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+def embed_prompt(prompt):
+    """Return the normalized float32 embedding of a prompt."""
+    import numpy as np
+
+    return get_embedding_model().encode(prompt, normalize_embeddings=True).astype(np.float32)
+
+
+def find_similar_response(conn, model, embedding):
+    """Find a cached response whose prompt is semantically close to `embedding`."""
+    import numpy as np
+
+    rows = conn.execute(
+        """
+        SELECT embedding, response FROM model_response_cache
+        WHERE model = ? AND embedding IS NOT NULL
+        ORDER BY ts DESC
+        LIMIT ?
+        """,
+        (model, SIMILARITY_SCAN_LIMIT),
+    ).fetchall()
+    if not rows:
+        return None
+
+    # Embeddings are normalized, so the dot product is the cosine similarity
+    cached = np.frombuffer(b"".join(row["embedding"] for row in rows), dtype=np.float32)
+    scores = cached.reshape(len(rows), -1) @ embedding
+    best = int(np.argmax(scores))
+    if scores[best] >= SIMILARITY_THRESHOLD:
+        return rows[best]["response"]
+    return None
+
+
+def to_messages(prompt):
+    """Wrap a plain prompt string into a chat message list."""
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return prompt
+
+
+def cache_model_response(func):
+    """Serve repeated (model, prompt) requests from the response cache.
+
+    Exact matches are looked up by the SHA-256 of the model and prompt; when
+    semantic caching is enabled, misses fall back to the most similar cached
+    prompt. Sampling with a positive temperature bypasses the cache.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, client_type, prompt, temperature=None, **kwargs):
+        if not RESPONSE_CACHE_ENABLED or (temperature or 0) > 0:
+            return func(self, client_type, prompt, temperature, **kwargs)
+
+        model = f"{client_type}:{MODEL_NAMES.get(client_type)}"
+        prompt_text = prompt if isinstance(prompt, str) else json.dumps(prompt, ensure_ascii=False)
+        prompt_hash = hashlib.sha256(f"{model}\n{prompt_text}".encode()).hexdigest()
+        embedding = None
+
+        with get_db_connection() as conn:
+            row = conn.execute(
+                "SELECT response FROM model_response_cache WHERE prompt_hash = ?",
+                (prompt_hash,),
+            ).fetchone()
+        if row is not None:
+            return row["response"]
+
+        if SEMANTIC_CACHE_ENABLED:
+            # Embedding may load the model, so it runs without holding the database lock
+            embedding = embed_prompt(prompt_text)
+            with get_db_connection() as conn:
+                cached_response = find_similar_response(conn, model, embedding)
+            if cached_response is not None:
+                return cached_response
+
+        response = func(self, client_type, prompt, temperature, **kwargs)
+        if not isinstance(response, str):
+            return response
+
+        with get_db_connection() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO model_response_cache
+                (prompt_hash, model, embedding, response)
+                VALUES (?, ?, ?, ?)
+                """,
+                (
+                    prompt_hash,
+                    model,
+                    embedding.tobytes() if embedding is not None else None,
+                    response,
+                ),
+            )
+            conn.commit()
+        return response
+
+    return wrapper
+
+
 class TestCooperativeBehavior:
     @pytest.fixture(autouse=True)
     def setup(self):
@@ -82,72 +331,178 @@ class TestCooperativeBehavior:
             model=GIGACHAT_MODEL,
         )
 
+        # Keep-alive session so Ollama calls reuse their TCP connection
+        self.ollama_session = requests.Session()
+        self.ollama_session.headers.update({"Content-Type": "application/json"})
+
+        # One worker per model, so a fan-out round never queues behind itself
+        self.executor = ThreadPoolExecutor(max_workers=len(MODEL_NAMES))
+
         yield
 
         # Cleanup after tests
         if hasattr(self, "gigachat_client"):
             self.gigachat_client.close()
+        if hasattr(self, "executor"):
+            self.executor.shutdown()
+        if hasattr(self, "ollama_session"):
+            self.ollama_session.close()
+
+    def get_model_response(self, client_type, prompt, temperature=None, batch=False):
+        """Get a response from a specific model.
 
-    def get_model_response(self, client_type, prompt):
-        """Get a response from a specific model."""
+        With `batch`, providers that offer a batch endpoint (currently OpenAI)
+        are called through it instead of the regular synchronous API.
+        """
         try:
-            if client_type == "openai":
-                response = self.openai_client.chat.completions.create(
-                    model=OPENAI_MODEL,
-                    messages=[{"role": "user", "content": prompt}],
-                )
-                return response.choices[0].message.content
-
-            elif client_type == "ollama":
-                response = requests.post(
-                    f"{OLLAMA_API_URL}/api/generate",
-                    json={
-                        "model": OLLAMA_MODEL,
-                        "prompt": prompt,
-                        "stream": False,
-                    },
-                )
-                return response.json()["response"]
+            return self.request_model_response(client_type, prompt, temperature, batch=batch)
+        except Exception as e:
+            return f"{ERROR_RESPONSE_PREFIX} {client_type}: {str(e)}"
+
+    @cache_model_response
+    def request_model_response(self, client_type, prompt, temperature=None, batch=False):
+        """Send a prompt or a list of chat messages to a specific model, raising on failure."""
+        messages = to_messages(prompt)
+
+        if client_type == "openai":
+            options = {} if temperature is None else {"temperature": temperature}
+            if batch:
+                return self.get_openai_batch_response(messages, options)
+            response = self.openai_client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                **options,
+            )
+            return response.choices[0].message.content
 
-            elif client_type == "gigachat":
-                response = self.gigachat_client.chat(prompt)
-                return response.choices[0].message.content
+        elif client_type == "ollama":
+            payload = {
+                "model": OLLAMA_MODEL,
+                "messages": messages,
+                "stream": False,
+            }
+            if temperature is not None:
+                payload["options"] = {"temperature": temperature}
+            response = self.ollama_session.post(f"{OLLAMA_API_URL}/api/chat", json=payload, timeout=60)
+            return orjson.loads(response.content)["message"]["content"]
+
+        elif client_type == "gigachat":
+            payload = {"messages": messages}
+            if temperature is not None:
+                payload["temperature"] = temperature
+            response = self.gigachat_client.chat(payload)
+            return response.choices[0].message.content
+
+    def get_openai_batch_response(self, messages, options):
+        """Get an OpenAI response through the Batch API, waiting for the batch to finish."""
+        request = {
+            "custom_id": "request-0",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": OPENAI_MODEL, "messages": messages, **options},
+        }
+        batch_file = self.openai_client.files.create(
+            file=("batch.jsonl", orjson.dumps(request) + b"\n"),
+            purpose="batch",
+        )
+        batch = None
+        try:
+            batch = self.openai_client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
 
-        except Exception as e:
-            return f"Error getting response from {client_type}: {str(e)}"
+            deadline = time.monotonic() + BATCH_MAX_WAIT
+            while batch.status not in BATCH_FINAL_STATUSES:
+                if time.monotonic() >= deadline:
+                    self.openai_client.batches.cancel(batch.id)
+                    raise TimeoutError(f"OpenAI batch {batch.id} did not finish within {BATCH_MAX_WAIT:g}s")
+                time.sleep(BATCH_POLL_INTERVAL)
+                batch = self.openai_client.batches.retrieve(batch.id)
+
+            if not batch.output_file_id:
+                if batch.error_file_id:
+                    errors = self.openai_client.files.content(batch.error_file_id).text
+                    raise RuntimeError(f"OpenAI batch {batch.id} request failed: {errors.strip()}")
+                raise RuntimeError(f"OpenAI batch {batch.id} finished with status {batch.status}")
+            if batch.status != "completed":
+                raise RuntimeError(f"OpenAI batch {batch.id} finished with status {batch.status}")
+
+            result = orjson.loads(self.openai_client.files.content(batch.output_file_id).content)
+            if result["error"]:
+                raise RuntimeError(f"OpenAI batch request failed: {result['error']}")
+            return result["response"]["body"]["choices"][0]["message"]["content"]
+        finally:
+            # Don't leave batch files behind in the organisation's file storage
+            file_ids = [batch_file.id]
+            if batch is not None:
+                file_ids += [batch.output_file_id, batch.error_file_id]
+            for file_id in filter(None, file_ids):
+                with suppress(OpenAIError):
+                    self.openai_client.files.delete(file_id)
+
+    async def aget_model_response(self, client_type, prompt):
+        """Get a response from a specific model without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(self.get_model_response, client_type, prompt, batch=USE_BATCH_API),
+        )
+
+    async def gather_model_responses(self, prompts):
+        """Request responses from several models concurrently.
+
+        `prompts` maps a client type to its prompt; the responses are returned
+        in the same order.
+        """
+        return await asyncio.gather(
+            *(self.aget_model_response(model, prompt) for model, prompt in prompts.items())
+        )
 
     def save_dialogue_to_db(self, test_name, dialogue_entries):
         """Save dialogue to the database."""
+        rows = [
+            (
+                test_name,
+                entry.get("model", "system"),
+                entry.get("type", "message"),
+                entry["content"],
+                entry.get("aspect"),
+                seq_num,
+            )
+            for seq_num, entry in enumerate(dialogue_entries)
+        ]
         with get_db_connection() as conn:
-            for seq_num, entry in enumerate(dialogue_entries):
-                conn.execute(
-                    """
-                    INSERT INTO model_dialogues 
-                    (test_name, model_name, message_type, message_content, aspect, sequence_number)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        test_name,
-                        entry.get("model", "system"),
-                        entry.get("type", "message"),
-                        entry["content"],
-                        entry.get("aspect"),
-                        seq_num,
-                    ),
-                )
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.executemany(INSERT_DIALOGUE_SQL, rows)
             conn.commit()
 
-    def get_dialogue_from_db(self, test_name):
-        """Retrieve dialogue from the database."""
+    def get_dialogue_from_db(self, test_name, batch_size=256):
+        """Retrieve dialogue from the database, yielding rows fetched `batch_size` at a time."""
         with get_db_connection() as conn:
-            return conn.execute(
+            cursor = conn.execute(
                 """
                 SELECT * FROM model_dialogues 
                 WHERE test_name = ? 
                 ORDER BY sequence_number
                 """,
                 (test_name,),
-            ).fetchall()
+            )
+
+        # The shared connection is only locked while a batch is fetched, so the
+        # caller may use the database between rows
+        try:
+            while True:
+                with get_db_connection():
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            with get_db_connection():
+                cursor.close()
 
     def print_dialogue_section(self, title, content):
         """Print a dialogue section in a formatted way."""
@@ -160,7 +515,7 @@ class TestCooperativeBehavior:
     def test_russian_dialogue(self):
         """Test dialogue between models in Russian."""
         dialogue_entries = []
-        test_name = f"russian_dialogue_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        test_name = f"russian_dialogue_{time.strftime('%Y%m%d_%H%M%S')}"
 
         # Initial topic
         topic = """
@@ -176,33 +531,30 @@ class TestCooperativeBehavior:
             }
         )
 
+        # New turns are only ever appended, so until the context window starts
+        # sliding every request shares the previous request's messages as a
+        # prefix and can reuse the provider's prompt cache
+        prefix = [
+            {"role": "system", "content": DIALOGUE_REQUIREMENTS},
+            {"role": "user", "content": topic},
+        ]
+        history = []
+
         models = ["openai", "ollama", "gigachat"]
 
         for i in range(3):
-            for model in models:
-                context = "\n".join([entry["content"] for entry in dialogue_entries])
-
-                prompt = f"""
-                Context of the previous discussion:
-                {context}
+            round_responses = {}
 
-                Please continue the dialogue, considering the following requirements:
-                1. The response must be in Russian
-                2. The response must be related to previous messages
-                3. Provide a constructive suggestion or idea
-                4. Response length - no more than 2-3 sentences
-                """
-
-                response = self.get_model_response(model, prompt)
+            for model in models:
+                # Each turn adds an assistant reply and a user prompt to the history
+                window_start = max(0, len(history) - 2 * CONTEXT_WINDOW_TURNS)
+                messages = prefix + history[window_start:]
+                response = self.get_model_response(model, messages)
+                round_responses[model] = response
 
-                # Validate the response
-                assert isinstance(response, str), f"Response from {model} must be a string"
-                assert len(response) > 0, f"Response from {model} must not be empty"
-                assert any(
-                    char.isalpha() for char in response
-                ), f"Response from {model} must contain letters"
-                has_russian = bool(re.search("[а-яА-Я]", response))
-                assert has_russian, f"Response from {model} must be in Russian"
+                # Failed requests must not become turns the next models reply to
+                assert isinstance(response, str) and response, f"Response from {model} must be a non-empty string"
+                assert not response.startswith(ERROR_RESPONSE_PREFIX), response
 
                 dialogue_entries.append(
                     {
@@ -211,16 +563,23 @@ class TestCooperativeBehavior:
                         "content": response,
                     }
                 )
+                history.append({"role": "assistant", "content": response})
+                history.append({"role": "user", "content": CONTINUE_PROMPT})
 
                 self.print_dialogue_section(f"Response from model {model}", response)
 
+            # Validate the language of the round's responses
+            for model, response in round_responses.items():
+                assert _ALPHA_RE.search(response), f"Response from {model} must contain letters"
+                assert _RU_RE.search(response), f"Response from {model} must be in Russian"
+
         # Save the dialogue to the database
         self.save_dialogue_to_db(test_name, dialogue_entries)
 
     def test_task_solving_dialogue(self):
         """Test collaborative task-solving by models."""
         dialogue_entries = []
-        test_name = f"task_solving_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        test_name = f"task_solving_{time.strftime('%Y%m%d_%H%M%S')}"
 
         task = """
         Task: Develop a concept for an educational platform for children.
@@ -247,20 +606,15 @@ class TestCooperativeBehavior:
 
         responses = {}
 
-        for model, aspect in aspects.items():
-            prompt = f"""
-            {task}
+        aspect_prompts = {
+            model: f"{task}\nPlease propose a solution for the following aspect: {aspect}\n{ASPECT_REQUIREMENTS}"
+            for model, aspect in aspects.items()
+        }
 
-            Please propose a solution for the following aspect: {aspect}
+        # The aspect prompts are independent, so all models are queried at once
+        aspect_responses = asyncio.run(self.gather_model_responses(aspect_prompts))
 
-            Requirements for the response:
-            1. The response must be in Russian
-            2. Provide a specific solution
-            3. Explain how it will help in children's education
-            4. Response length - 2-3 sentences
-            """
-
-            response = self.get_model_response(model, prompt)
+        for (model, aspect), response in zip(aspects.items(), aspect_responses):
             responses[model] = response
 
             dialogue_entries.append(
@@ -275,28 +629,25 @@ class TestCooperativeBehavior:
             # Validate the response
             assert isinstance(response, str), f"Response from {model} must be a string"
             assert len(response) > 0, f"Response from {model} must not be empty"
-            has_russian = bool(re.search("[а-яА-Я]", response))
+            has_russian = bool(_RU_RE.search(response))
             assert has_russian, f"Response from {model} must be in Russian"
 
             self.print_dialogue_section(f"Response from model {model} for aspect '{aspect}'", response)
 
-        final_prompt = f"""
-        Analyze the proposed solutions and suggest how they can be combined:
-        Technical solution: {responses['openai']}
-        Pedagogical solution: {responses['ollama']}
-        UX solution: {responses['gigachat']}
-
-        Requirements for the response:
-        1. The response must be in Russian
-        2. Propose a concrete plan for combining the solutions
-        3. Indicate the advantages of such a combination
-        4. Response length - 3-4 sentences
-        """
+        final_prompt = (
+            "Analyze the proposed solutions and suggest how they can be combined:\n"
+            f"Technical solution: {responses['openai']}\n"
+            f"Pedagogical solution: {responses['ollama']}\n"
+            f"UX solution: {responses['gigachat']}\n"
+            f"{FINAL_REQUIREMENTS}"
+        )
 
         print("\nFinal discussion of solutions:")
-        for model in models:
-            final_response = self.get_model_response(model, final_prompt)
+        final_responses = asyncio.run(
+            self.gather_model_responses({model: final_prompt for model in models})
+        )
 
+        for model, final_response in zip(models, final_responses):
             dialogue_entries.append(
                 {
                     "model": model,
@@ -308,7 +659,7 @@ class TestCooperativeBehavior:
             # Validate the final response
             assert isinstance(final_response, str), f"Final response from {model} must be a string"
             assert len(final_response) > 0, f"Final response from {model} must not be empty"
-            has_russian = bool(re.search("[а-яА-Я]", final_response))
+            has_russian = bool(_RU_RE.search(final_response))
             assert has_russian, f"Final response from {model} must be in Russian"
 
             # Check for meaningful content
@@ -332,30 +683,27 @@ class TestCooperativeBehavior:
 def view_latest_test_results():
     """View the latest test results from the database."""
     with get_db_connection() as conn:
-        # Retrieve the latest tests
-        latest_tests = conn.execute(
+        # Retrieve the messages of the latest tests in a single query
+        rows = conn.execute(
             """
-            SELECT DISTINCT test_name, timestamp 
-            FROM model_dialogues 
-            ORDER BY timestamp DESC 
-            LIMIT 5
+            WITH latest AS (
+                SELECT test_name, MAX(timestamp) AS ts
+                FROM model_dialogues
+                GROUP BY test_name
+                ORDER BY ts DESC
+                LIMIT 5
+            )
+            SELECT l.test_name, l.ts, m.model_name, m.message_type, m.message_content, m.aspect
+            FROM latest l
+            JOIN model_dialogues m USING (test_name)
+            ORDER BY l.ts DESC, l.test_name, m.sequence_number
             """
-        ).fetchall()
-
-        for test in latest_tests:
-            print(f"\n=== Test: {test['test_name']} ===")
-            print(f"Time: {test['timestamp']}")
+        )
 
-            # Retrieve messages for the test
-            messages = conn.execute(
-                """
-                SELECT model_name, message_type, message_content, aspect
-                FROM model_dialogues
-                WHERE test_name = ?
-                ORDER BY sequence_number
-                """,
-                (test["test_name"],),
-            ).fetchall()
+        for test_name, messages in itertools.groupby(rows, key=lambda row: row["test_name"]):
+            messages = list(messages)
+            print(f"\n=== Test: {test_name} ===")
+            print(f"Time: {messages[0]['ts']}")
 
             for msg in messages:
                 print(f"\nModel: {msg['model_name']}")